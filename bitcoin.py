@@ -1,33 +1,273 @@
 from builtins import print
-import datetime # usada para colocar o timestamp em cada bloco
+import datetime # usada para formatar o timestamp dos blocos nas respostas
+import functools
 import json
 import hashlib
+import os
+import random
+import struct
+import threading
 import time
-from flask import Flask, jsonify
+from array import array
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, jsonify
+
+try:
+	# orjson é opcional: serializa as respostas mais rápido que o json da biblioteca padrão
+	import orjson
+except ImportError:
+	orjson = None
+
+# o timestamp entra no header como um inteiro de 8 bytes (big-endian), com tamanho fixo
+TIMESTAMP = struct.Struct('>Q')
+
+# dificuldade (nbits) usada para minerar todos os blocos da cadeia
+DIFFICULTY_BITS = 486604799
+
+# o nbits (dificuldade) entra no header como um inteiro de 4 bytes (big-endian), logo após o timestamp,
+# para que alterar a dificuldade de um bloco altere também a sua hash
+NBITS = struct.Struct('>I')
+
+# o nonce entra no header como um inteiro de 8 bytes (little-endian), com tamanho fixo
+NONCE = struct.Struct('<Q')
+
+# cada transação é armazenada precedida pelo seu tamanho em bytes (inteiro de 4 bytes, little-endian)
+TX_LENGTH = struct.Struct('<I')
+
+# quantidade de nonces testados a cada chamada de `mine_batch`
+MINE_BATCH = 1 << 16
+
+
+def encode_header_prefix(timestamp, nbits, previous_hash, transactions_hash):
+	"""
+		Função que monta a parte do header do bloco que não muda durante a mineração
+		(tudo que vem antes do nonce no dado usado para gerar a hash)
+
+		- `param`: timestamp - timestamp do bloco
+		- `param`: nbits - dificuldade do bloco
+		- `param`: previous_hash - hash do bloco anterior
+		- `param`: transactions_hash - hash das transações do bloco
+		- `return`: prefixo do header em bytes
+	"""
+	return TIMESTAMP.pack(timestamp) + NBITS.pack(nbits) + f'{previous_hash}{transactions_hash}'.encode()
+
+
+def decode_transactions(data):
+	"""
+		Função que converte as transações armazenadas em bytes de volta para uma lista de strings
+
+		- `param`: data - transações, cada uma precedida pelo seu tamanho (ver `TX_LENGTH`)
+		- `return`: lista com as transações
+	"""
+	transactions = []
+	offset = 0
+
+	while offset < len(data):
+		(size,) = TX_LENGTH.unpack_from(data, offset)
+		offset += TX_LENGTH.size
+		transactions.append(data[offset:offset + size].decode())
+		offset += size
+
+	return transactions
+
+
+def mine_batch(prefix_state, nonce_base, target_be, batch=MINE_BATCH, stride=1):
+	"""
+		Função que testa um lote de `batch` nonces, a partir de `nonce_base` e pulando de `stride` em `stride`
+
+		- `param`: prefix_state - estado do sha256 após processar a parte fixa do header (midstate)
+		- `param`: nonce_base - primeiro nonce do lote
+		- `param`: target_be - target em bytes (32 bytes, big-endian)
+		- `param`: batch - quantidade de nonces do lote
+		- `param`: stride - distância entre dois nonces testados
+
+		- `return`: tupla (nonce, hash) caso algum nonce do lote seja válido, senão None
+	"""
+
+	# buffer reutilizado para os bytes do nonce, que é sobrescrito a cada tentativa
+	nonce_slot = bytearray(NONCE.size)
+
+	# nomes locais evitam buscas de atributo a cada iteração
+	pack_into = NONCE.pack_into
+	copy_state = prefix_state.copy
+
+	for nonce in range(nonce_base, nonce_base + batch * stride, stride):
+		# parte do estado já calculado, processando apenas os bytes do nonce
+		pack_into(nonce_slot, 0, nonce)
+		h = copy_state()
+		h.update(nonce_slot)
+
+		# verifica se a hash esta de acordo com a dificuldade, comparando os bytes do digest
+		# direto com os bytes do target (big-endian, então a ordem dos bytes é a ordem numérica)
+		# ps: quanto menor o target maior a dificuldade da busca
+		if h.digest() < target_be:
+			return nonce, h.hexdigest()
+
+	return None
+
+
+def mine(header_prefix, nonce_start, target, stride=1, stop=None):
+	"""
+		Função que realiza a busca pelo nonce: a partir de `nonce_start`, testa lotes de nonces
+		até que a hash do header fique abaixo do target
+
+		- `param`: header_prefix - parte fixa do header do bloco (ver `Blockchain.header_prefix`)
+		- `param`: nonce_start - primeiro nonce a ser testado
+		- `param`: target - valor que a hash do bloco deve ser menor
+		- `param`: stride - distância entre dois nonces testados (só são testados os nonces
+			congruentes a `nonce_start` módulo `stride`)
+		- `param`: stop - evento que, quando sinalizado, interrompe a busca (verificado a cada lote)
+
+		- `return`: tupla (nonce, hash) com o nonce encontrado e a hash correspondente,
+			ou None caso a busca seja interrompida
+	"""
+	nonce_base = nonce_start
+
+	# o prefixo do header não muda entre tentativas, então é processado uma única vez
+	prefix_state = hashlib.sha256(header_prefix)
+	target_be = target.to_bytes(32, 'big')
+
+	while stop is None or not stop.is_set():
+		found = mine_batch(prefix_state, nonce_base, target_be, stride=stride)
+		if found is not None:
+			return found
+
+		# passa para o próximo lote caso não for encontrado
+		nonce_base += MINE_BATCH * stride
+
+	return None
+
+
+# evento de parada compartilhado entre os processos de mineração (ver `init_mine_worker`)
+mine_stop = None
+
+
+def init_mine_worker(stop):
+	"""
+		Função executada ao iniciar cada processo de mineração, guardando o evento de parada compartilhado
+
+		- `param`: stop - evento sinalizado quando algum processo encontra um nonce válido
+	"""
+	global mine_stop
+	mine_stop = stop
+
+
+def mine_worker(header_prefix, nonce_start, target, stride):
+	"""
+		Função executada por cada processo de mineração: busca nos nonces congruentes a `nonce_start`
+		módulo `stride`, até encontrar um nonce válido ou até outro processo encontrar
+
+		- `return`: o mesmo que `mine`
+	"""
+	return mine(header_prefix, nonce_start, target, stride, mine_stop)
+
+
+class BlockStore:
+	"""
+		Classe que armazena os blocos da blockchain
+
+		Ao invés de uma lista de dicionários, cada atributo dos blocos é guardado em um vetor próprio
+		(o i-ésimo elemento de cada vetor pertence ao i-ésimo bloco). Os valores inteiros ficam em
+		vetores compactos (`array`), e o dicionário de um bloco só é montado quando pedido (`block_view`)
+
+		A cadeia só cresce por `append`, e os blocos são somente leitura: o dicionário retornado por
+		`chain[i]` é uma cópia, então alterá-lo não altera o bloco armazenado. Só são aceitos índices
+		inteiros (não há suporte a fatias)
+	"""
+	def __init__(self):
+		"""
+			Método que inicializa os vetores vazios
+		"""
+		self.timestamps = array('Q')
+		self.nbits = array('L')
+		self.nonces = array('Q')
+		self.previous_hashes = []
+		self.hashes = []
+		self.transactions = []
+		self.transactions_hashes = []
+
+	def __len__(self):
+		# o último vetor preenchido em `append`, para que um bloco só seja visível após ser inserido por completo
+		return len(self.transactions_hashes)
+
+	def __getitem__(self, index):
+		return self.block_view(index)
+
+	def __iter__(self):
+		return map(self.block_view, range(len(self)))
+
+	def append(self, block):
+		"""
+			Método que insere um bloco no final da cadeia
+
+			- `param`: block - bloco a ser inserido (dicionario)
+		"""
+		self.timestamps.append(block['timestamp'])
+		self.nbits.append(block['nbits'])
+		self.nonces.append(block['nonce'])
+		self.previous_hashes.append(block['previous_hash'])
+		self.hashes.append(block['hash'])
+		self.transactions.append(block['transactions'])
+		self.transactions_hashes.append(block['transactions_hash'])
+
+	def block_view(self, index):
+		"""
+			Método que monta o dicionário de um bloco a partir dos vetores
+
+			- `param`: index - posição do bloco na cadeia (aceita índices negativos)
+			- `return`: cópia do bloco (dicionario)
+		"""
+		if not isinstance(index, int):
+			raise TypeError(f'BlockStore aceita apenas índices inteiros, não {type(index).__name__}')
+
+		index = range(len(self))[index]
+
+		return {
+			'index': index + 1,
+			'timestamp': self.timestamps[index],
+			'nbits': self.nbits[index],
+			'nonce': self.nonces[index],
+			'previous_hash': self.previous_hashes[index],
+			'hash': self.hashes[index],
+			'transactions': self.transactions[index],
+			'transactions_hash': self.transactions_hashes[index]
+		}
+
 
 class Blockchain:
 	"""
 		Classe que constroi e armazena a blockchain
 
-		Cada bloco da blockchain é um dicionário contendo 4 atributos:
+		Os blocos são armazenados em um `BlockStore`, e cada bloco é visto como um dicionário contendo os atributos:
 		`index`: indice do bloco na lista blockchain 
-		`timestamp`: marcador temporal de quando o bloco foi criado/minerado
+		`timestamp`: marcador temporal de quando o bloco foi criado/minerado (segundos desde a epoch, inteiro)
 		`nonce`: valor referente ao proof of work usado na mineração do bloco
 		`previous_hash`: hash do bloco anterior (para linkar um bloco cronologicamente a outro)
-		`transactions`: transações realizadas
+		`hash`: hash do próprio bloco, guardada quando o bloco é minerado
+		`transactions`: transações realizadas (em bytes, cada uma precedida pelo seu tamanho)
 		`transactions_hash`: hash sobre o vetor das transações realizadas
 	"""
 	def __init__(self):
 		"""
-			Método que inicializa a lista que conterá os blocos da blockchain,
+			Método que inicializa o armazenamento que conterá os blocos da blockchain,
 			e insere nela o bloco genesis (primeiro bloco da estrutura)
-			Alem disso inicializa a lista de transações que ainda não foram armazenadas em blocos
+			Alem disso inicializa o buffer de transações que ainda não foram armazenadas em blocos
 		"""
-		self.chain = []
-		self.current_transactions = []
+		self.chain = BlockStore()
+		self.current_transactions = bytearray()
+
+		# hash das transações, atualizada a cada nova transação (evita percorrer o buffer a cada bloco)
+		self._tx_hasher = hashlib.sha256()
+
+		# protege o buffer e a sua hash, que são alterados juntos (transações chegam em threads
+		# das rotas enquanto o bloco a ser minerado é criado na thread de mineração)
+		self._tx_lock = threading.Lock()
 
 		# a hash é passado como 0 pois esse bloco não tem um bloco antecedente
-		self.chain.append(self.create_block(nonce=1, previous_hash='0'))
+		genesis = self.create_block(nonce=1, previous_hash='0')
+		genesis['hash'] = self.hash(genesis)
+		self.chain.append(genesis)
 
 
 	def create_block(self, nonce, previous_hash):
@@ -39,19 +279,50 @@ class Blockchain:
 
 			- `return`: o bloco criado (dicionario)
 		"""
+		# cópia das transações pendentes; elas só são retiradas do buffer quando o bloco é inserido
+		# na cadeia (ver `clear_transactions`), para que não se percam caso a mineração falhe
+		with self._tx_lock:
+			transactions = bytes(self.current_transactions)
+			transactions_hash = self._tx_hasher.hexdigest()
+
 		block = {
 			'index': len(self.chain) + 1,
-			'timestamp': str(datetime.datetime.now()),
-			'nbits': 486604799,
+			'timestamp': int(time.time()),
+			'nbits': DIFFICULTY_BITS,
 			'nonce': nonce,
 			'previous_hash': previous_hash,
-			'transactions': self.current_transactions,
-			'transactions_hash': hashlib.sha256(str(self.current_transactions).encode()).hexdigest()
+			'transactions': transactions,
+			'transactions_hash': transactions_hash
 		}
 
 		# self.chain.append(block)
 		return block
 
+	def new_transaction(self, tr_str):
+		"""
+			Método que adiciona uma transação ao buffer de transações que ainda não foram armazenadas em blocos
+
+			- `param`: tr_str - transação a ser adicionada
+		"""
+		payload = tr_str.encode()
+		record = TX_LENGTH.pack(len(payload)) + payload
+
+		with self._tx_lock:
+			self.current_transactions += record
+			self._tx_hasher.update(record)
+
+	def clear_transactions(self, block):
+		"""
+			Método que retira do buffer as transações armazenadas em um bloco já inserido na cadeia
+			As transações recebidas após a criação do bloco (durante a mineração) ficam para o próximo bloco
+
+			- `param`: block - bloco inserido na cadeia
+		"""
+		with self._tx_lock:
+			# as transações do bloco são o início do buffer, pois novas transações são sempre adicionadas ao final
+			del self.current_transactions[:len(block['transactions'])]
+			self._tx_hasher = hashlib.sha256(self.current_transactions)
+
 	def get_previous_block(self):
 		"""
 			Método que retorna o ultimo bloco da blockchain
@@ -61,59 +332,92 @@ class Blockchain:
 		last_block = self.chain[-1]
 		return last_block
 
-	def calculate_target(self, bits):
+	@staticmethod
+	@functools.lru_cache(maxsize=None)
+	def calculate_target(bits):
 		# http://www.righto.com/2014/02/bitcoin-mining-hard-way-algorithms.html
 		# https://gist.github.com/shirriff/cd5c66da6ba21a96bb26#file-mine-py
 		# https://gist.github.com/shirriff/cd5c66da6ba21a96bb26#file-mine-py
 		# https://en.bitcoin.it/wiki/Difficulty
+		# o target depende apenas de nbits, então é calculado uma única vez para cada valor
 		exp = bits >> 24
 		mant = bits & 0xffffff
-		target_hexstr = '%064x' % (mant * (1<<(8*(exp - 3))))
-		target_str = int(target_hexstr, 16)
-		return target_str
+		return mant << (8 * (exp - 3))
 
-	def proof_of_work(self):
+	def new_block(self):
 		"""
-			Método em que é realizada a busca pelo valor de proof que gere uma hash de acordo com uma 
-			dificuldade (a hash deve ser iniciada com 4 zeros), até que esta seja encontrada,
+			Método que cria o bloco a ser minerado, linkado ao último bloco da cadeia
+
+			- `return`: o bloco criado, ainda sem o nonce válido (dicionario)
+		"""
+		# a busca começa em um nonce aleatório, para que diferentes mineradores não testem os mesmos valores
+		# a hash do último bloco já foi guardada quando ele foi minerado, não sendo necessário recalculá-la
+		return self.create_block(random.getrandbits(32), self.get_previous_block()['hash'])
+
+	def proof_of_work(self, workers=None):
+		"""
+			Método em que é realizada a busca pelo valor de nonce que gere uma hash de acordo com uma 
+			dificuldade (a hash deve ser menor que o target definido em nbits), até que esta seja encontrada,
 			para que então o bloco seja mineirado 
 
-			- `param`: previous_proof - valor proof do último bloco da cadeia
+			A busca é dividida entre `workers` processos, cada um testando um conjunto disjunto de nonces
+
+			- `param`: workers - quantidade de processos (por padrão, a quantidade de CPUs)
 
-			- `return`: valor do novo proof
+			- `return`: o bloco minerado
 		"""
-		
-		block = self.create_block(1, self.hash(self.get_previous_block()))
+		# os.cpu_count() pode retornar None quando a quantidade de CPUs não é conhecida
+		workers = workers or os.cpu_count() or 1
 
-		# status da busca
-		check_nonce = False
+		block = self.new_block()
 		target = self.calculate_target(block['nbits'])
+		search = functools.partial(mine_worker, self.header_prefix(block), target=target, stride=workers)
 
 		start_time = time.time()
 
-		# a busca é feita até que se encontre uma hash de acordo com a dificuldade
-		while check_nonce is False:
-			
-			# o algoritmo a ser resolvido é baseado no novo valor do nonce e no anterior, de forma a "linkar" os blocos 
-			# e o valor hash é criptografado em hexadecimal
-			# esse algoritmo é escolhido para que não ocorra um caso em que o new_nonce e previous_nonce estejam invertidos e resultem
-			# em um mesmo nonce, já o quadrado é para que a subtração não resulte sempre em 1
-			hash_operation = self.hash(block)
-			
-			# verifica se a hash esta de acordo com a dificuldade (iniciar com 4 zeros)
-			# ps: quanto mais zeros maior a dificuldade da busca
-			if int(hash_operation, 16) < target:
-				check_nonce = True
-			else:
-				# modifica o valor do novo nonce caso não for encontrado
-				block['nonce'] += 1
+		# o processo k testa os nonces nonce + k, nonce + k + workers, nonce + k + 2*workers, ...
+		# e o primeiro a encontrar um nonce válido sinaliza os demais para pararem
+		# ps: os processos são criados com spawn, pois `proof_of_work` roda em uma thread do servidor,
+		# e criar processos com fork a partir de um processo com várias threads pode travar
+		# (e spawn, ao contrário do forkserver, existe em todas as plataformas)
+		context = multiprocessing.get_context('spawn')
+		stop = context.Event()
+		with context.Pool(workers, initializer=init_mine_worker, initargs=(stop,)) as pool:
+			found = None
+			for result in pool.imap_unordered(search, range(block['nonce'], block['nonce'] + workers)):
+				if result is not None:
+					found = result
+					stop.set()
+					break
+
+			pool.close()
+			pool.join()
+
+		# todos os processos terminaram sem encontrar um nonce (só ocorre caso a busca seja interrompida)
+		if found is None:
+			raise RuntimeError('a mineração terminou sem encontrar um nonce válido')
+
+		# a hash encontrada na busca é guardada no bloco
+		block['nonce'], block['hash'] = found
 
 		end_time = time.time()
 		print('tempo:', end_time - start_time)
 
 		self.chain.append(block)
+		self.clear_transactions(block)
 		return block
 
+	def header_prefix(self, block):
+		"""
+			Método que retorna a parte do header do bloco que não muda durante a mineração
+			(tudo que vem antes do nonce no dado usado para gerar a hash)
+
+			- `param`: block - bloco do qual será extraído o prefixo
+			- `return`: prefixo do header em bytes
+		"""
+
+		return encode_header_prefix(block["timestamp"], block["nbits"], block["previous_hash"], block["transactions_hash"])
+
 	def hash(self, block):
 		"""
 			Método que criptografa o bloco e retorna o hash do bloco 
@@ -123,43 +427,68 @@ class Blockchain:
 			- `return`: hash do bloco
 		"""
 	
-		return hashlib.sha256(f'{block["timestamp"]}{block["previous_hash"]}{block["transactions_hash"]}{block["nonce"]}'.encode()).hexdigest()
+		return hashlib.sha256(self.header_prefix(block) + NONCE.pack(block["nonce"])).hexdigest()
    
 	def is_chain_valid(self, chain):
 		"""
 			Método que verifica a validade da blockchain, para preservar a integridade da mesma
 
-			- `param`: chain - cadeia blockchain que será verificada
+			- `param`: chain - cadeia blockchain que será verificada (`BlockStore` ou lista de blocos,
+				como a retornada em /get_chain)
 			- `return`: True caso a cadeia esteja integra e False caso não esteja
 		"""
-		
-		# pega o bloco genesis como bloco anterior
-		previous_block = chain[0]
-		block_index = 1
 
-		# Itera pela cadeia a partir do segundo bloco (sendo o primeiro o genesis, utilizado como bloco anterior)
-		while block_index < len(chain):
-			# Bloco atual
-			block = chain[block_index]
+		# uma lista de blocos é convertida para um `BlockStore`; blocos sem algum atributo, ou com valores
+		# que não cabem nos vetores, tornam a cadeia inválida
+		if not isinstance(chain, BlockStore):
+			store = BlockStore()
+			try:
+				for block in chain:
+					store.append(block)
+			except (KeyError, TypeError, OverflowError):
+				return False
+			chain = store
 
+		# os vetores da cadeia são percorridos diretamente, sem montar o dicionário de cada bloco
+		timestamps = chain.timestamps
+		nbits = chain.nbits
+		nonces = chain.nonces
+		previous_hashes = chain.previous_hashes
+		hashes = chain.hashes
+		transactions_hashes = chain.transactions_hashes
+		sha256 = hashlib.sha256
+
+		# Verifica se a hash guardada no bloco genesis corresponde ao seu conteúdo
+		if hashes[0] != self.hash(chain.block_view(0)):
+			return False
+
+		# Itera pela cadeia a partir do segundo bloco (sendo o primeiro o genesis, utilizado como bloco anterior)
+		for block_index in range(1, len(chain)):
 			# Verifica se o bloco atual está linkado ao bloco anterior (previous hash igual a hash do bloco anterior)
 			# Se não tiver, então a cadeia não é valida
-			if block["previous_hash"] != self.hash(previous_block):
+			# ps: a hash do bloco anterior é a guardada nele, já verificada na iteração anterior
+			if previous_hashes[block_index] != hashes[block_index - 1]:
 				return False
 
-			# Verifica se a hash dp valor de proof atual, quando passado pelo algoritmo (utilizando também o proof anterior)
-			# passa pelo dificuldade atual definida (iniciar com 4 zeros)
-			previous_proof = previous_block['proof']
-			current_proof = block['proof']
-			hash_operation = hashlib.sha256(str(current_proof ** 2 - previous_proof ** 2).encode()).hexdigest()
-			
-			# Verifica a operação hash, caso não estiver de acordo com a dificuldade, a cadeia não é valida
-			if hash_operation[:7] != '0000000':
+			# Verifica se a hash guardada no bloco atual corresponde ao seu conteúdo
+			header = encode_header_prefix(timestamps[block_index], nbits[block_index], previous_hashes[block_index], transactions_hashes[block_index])
+			digest = sha256(header + NONCE.pack(nonces[block_index])).digest()
+
+			if digest.hex() != hashes[block_index]:
 				return False
 
-			# Modifica o bloco anterior e o atual e segue verificando a cadeia
-			previous_block = block
-			block_index += 1
+			# Verifica se o bloco foi minerado com a dificuldade da cadeia (um bloco com um nbits próprio,
+			# mais fácil, poderia ser minerado rapidamente e ainda passar pela verificação abaixo)
+			if nbits[block_index] != DIFFICULTY_BITS:
+				return False
+
+			# Verifica se a hash do bloco atual passa pela dificuldade definida em nbits
+			# (comparação entre os bytes da hash e os bytes do target, ambos big-endian)
+			target_be = self.calculate_target(DIFFICULTY_BITS).to_bytes(32, 'big')
+
+			# Caso a hash não estiver de acordo com a dificuldade, a cadeia não é valida
+			if digest >= target_be:
+				return False
 
 		# Caso em que nenhum bloco está invalido, retorna True
 		return True
@@ -171,33 +500,98 @@ class Blockchain:
 
 app = Flask(__name__)
 
+
+def json_response(obj):
+	"""
+		Função que serializa a resposta de uma rota em JSON, usando o orjson quando disponível
+
+		- `param`: obj - objeto a ser serializado
+		- `return`: resposta do flask
+	"""
+	if orjson is None:
+		return jsonify(obj)
+
+	return Response(orjson.dumps(obj), mimetype='application/json')
+
+
 blockchain = Blockchain()
 
+# a mineração é feita em uma thread separada (que divide a busca entre processos em `proof_of_work`),
+# para que as rotas não fiquem bloqueadas durante a busca; com uma única thread, apenas um trabalho
+# roda por vez, pois todos partem do mesmo último bloco da cadeia
+mine_executor = ThreadPoolExecutor(max_workers=1)
+
+# trabalhos de mineração (id -> future com o bloco minerado); apenas os MAX_MINE_JOBS mais recentes
+# são mantidos para consulta, para que o dicionário não cresça indefinidamente
+MAX_MINE_JOBS = 100
+mine_jobs = {}
+mine_lock = threading.Lock()
+current_job = None
+
 
 @app.route('/mine_block', methods=['GET'])
 def mine_block():
-	# create a block
-	block = blockchain.proof_of_work()
+	global current_job
+
+	with mine_lock:
+		# caso já exista uma mineração em andamento, retorna o id dela
+		if current_job is None or mine_jobs[current_job].done():
+			current_job = (current_job or 0) + 1
+			mine_jobs[current_job] = mine_executor.submit(blockchain.proof_of_work)
+
+			# descarta os trabalhos mais antigos (o dicionário mantém a ordem de inserção); todos já
+			# terminaram, pois apenas o trabalho atual pode estar em andamento
+			while len(mine_jobs) > MAX_MINE_JOBS:
+				del mine_jobs[next(iter(mine_jobs))]
+
+		job_id = current_job
+
+	response = {'message': 'Mining started!',
+				'job_id': job_id}
+	return json_response(response), 202
+
+
+@app.route('/mine_block/<int:job_id>', methods=['GET'])
+def mine_block_status(job_id):
+	future = mine_jobs.get(job_id)
+	if future is None:
+		return json_response({'message': 'Job not found!'}), 404
+
+	if not future.done():
+		return json_response({'message': 'Mining...', 'job_id': job_id}), 202
+
+	if future.exception() is not None:
+		return json_response({'message': 'Mining failed!', 'job_id': job_id}), 500
 
+	block = future.result()
 	response = {'message': 'Block mined!',
 				'index': block['index'],
-				'timestamp': block['timestamp'],
+				'timestamp': datetime.datetime.fromtimestamp(block['timestamp']).isoformat(' '),
 				'nonce': block['nonce'],
-				'previous_hash': block['previous_hash']}
-	return jsonify(response), 200
+				'previous_hash': block['previous_hash'],
+				'hash': block['hash']}
+	return json_response(response), 200
 
 
 @app.route('/get_chain', methods=['GET'])
 def get_chain():
-	response = {'chain': blockchain.chain,
+	# as transações são armazenadas em bytes, e convertidas para strings apenas na resposta
+	chain = [dict(block, transactions=decode_transactions(block['transactions'])) for block in blockchain.chain]
+	response = {'chain': chain,
 				'length': len(blockchain.chain)}
-	return jsonify(response), 200
+	return json_response(response), 200
 
 
 @app.route('/new_transaction/<tr_str>', methods=['GET'])
 def new_transaction(tr_str):
-	blockchain.current_transactions.append(tr_str)
+	blockchain.new_transaction(tr_str)
 
+	response = {'message': 'Transaction added!',
+				'transaction': tr_str}
+	return json_response(response), 200
 
 
-app.run(host='0.0.0.0', port=5000)
+# servidor de desenvolvimento; em produção a aplicação deve ser servida por um servidor WSGI
+# com um único processo, ex: `gunicorn -w 1 --threads 8 bitcoin:app`
+if __name__ == '__main__':
+	app.run(host='0.0.0.0', port=5000)
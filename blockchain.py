@@ -1,8 +1,32 @@
-import datetime # usada para colocar o timestamp em cada bloco
-import json
+import datetime # usada para formatar o timestamp dos blocos nas respostas
 import hashlib
+import multiprocessing
+import struct
+import threading
 import time
-from flask import Flask, jsonify
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from flask import Flask, Response, jsonify
+
+try:
+    # orjson é opcional: serializa as respostas mais rápido que o json da biblioteca padrão
+    import orjson
+except ImportError:
+    orjson = None
+
+# a hash (digest) deve ter os 4 primeiros bytes menores que esse valor, o que equivale
+# à hash em hexadecimal iniciar com 7 zeros
+DIFFICULTY_PREFIX = b'\x00\x00\x00\x10'
+
+# formato binário dos dados do bloco usados para gerar a hash: index, timestamp, proof e previous_hash
+HEADER = struct.Struct('>QQQ32s')
+
+# quantidade de bytes (little-endian, com sinal) usados para representar proof² - proof_anterior² na hash
+PROOF_BYTES = 16
+
+# limite (exclusivo) dos valores de proof: garante que proof² - proof_anterior² caiba em PROOF_BYTES
+# bytes com sinal e que o proof caiba no campo de 8 bytes de HEADER
+MAX_PROOF = 1 << 63
 
 class Blockchain:
     """
@@ -10,9 +34,9 @@ class Blockchain:
 
         Cada bloco da blockchain é um dicionário contendo 4 atributos:
         `index`: indice do bloco na lista blockchain 
-        `timestamp`: marcador temporal de quando o bloco foi criado/minerado
+        `timestamp`: marcador temporal de quando o bloco foi criado/minerado (segundos desde a epoch, inteiro)
         `proof`: valor referente ao proof of work usado na mineração do bloco
-        `previous_hash`: hash do bloco anterior (para linkar um bloco cronologicamente a outro)
+        `previous_hash`: hash do bloco anterior (para linkar um bloco cronologicamente a outro), em bytes
     """
     def __init__(self):
         """
@@ -21,8 +45,8 @@ class Blockchain:
         """
         self.chain = []
 
-        # a hash é passad como 0 pois esse bloco não tem um bloco antecedente
-        self.create_blockchain(proof=1, previous_hash='0')
+        # a hash é passada como 0 (32 bytes zerados) pois esse bloco não tem um bloco antecedente
+        self.create_blockchain(proof=1, previous_hash=bytes(32))
 
 
     def create_blockchain(self, proof, previous_hash):
@@ -36,7 +60,7 @@ class Blockchain:
         """
         block = {
             'index': len(self.chain) + 1,
-            'timestamp': str(datetime.datetime.now()),
+            'timestamp': int(time.time()),
             'proof': proof,
             'previous_hash': previous_hash
         }
@@ -53,7 +77,8 @@ class Blockchain:
         last_block = self.chain[-1]
         return last_block
 
-    def proof_of_work(self, previous_proof):
+    @staticmethod
+    def proof_of_work(previous_proof):
         """
             Método em que é realizada a busca pelo valor de proof que gere uma hash de acordo com uma 
             dificuldade (a hash deve ser iniciada com 4 zeros), até que esta seja encontrada,
@@ -65,27 +90,33 @@ class Blockchain:
         """
         # novo proof pelo qual será feita a busca
         new_proof = 1
-        # status da busca
-        check_proof = False
+        # o quadrado do proof anterior não muda durante a busca
+        previous_square = previous_proof * previous_proof
+        # nomes locais evitam buscas de atributo e de variáveis globais a cada iteração
+        sha256 = hashlib.sha256
+        difficulty_prefix = DIFFICULTY_PREFIX
 
         start_time = time.time()
 
         # a busca é feita até que se encontre uma hash de acordo com a dificuldade
-        while check_proof is False:
+        while True:
             
             # o algoritmo a ser resolvido é baseado no novo valor do proof e no anterior, de forma a "linkar" os blocos 
-            # e o valor hash é criptografado em hexadecimal
+            # e o valor hash é obtido em bytes (digest)
             # esse algoritmo é escolhido para que não ocorra um caso em que o new_proof e previous_proof estejam invertidos e resultem
             # em um mesmo proof, já o quadrado é para que a subtração não resulte sempre em 1
-            hash_operation = hashlib.sha256(str(new_proof ** 2 - previous_proof ** 2).encode()).hexdigest()
+            # o resultado é convertido direto para bytes, sem passar por uma string decimal
+            operation = new_proof * new_proof - previous_square
+            hash_operation = sha256(operation.to_bytes(PROOF_BYTES, 'little', signed=True)).digest()
             
-            # verifica se a hash esta de acordo com a dificuldade (iniciar com 4 zeros)
+            # verifica se a hash esta de acordo com a dificuldade (iniciar com 7 zeros em hexadecimal,
+            # ou seja, os 4 primeiros bytes do digest menores que 0x00000010)
             # ps: quanto mais zeros maior a dificuldade da busca
-            if hash_operation[:7] == '0000000':
-                check_proof = True
-            else:
-                # modifica o valor do novo proof caso não for encontrado
-                new_proof += 1
+            if hash_operation[:4] < difficulty_prefix:
+                break
+
+            # modifica o valor do novo proof caso não for encontrado
+            new_proof += 1
 
         end_time = time.time()
         print('tempo:', end_time - start_time)
@@ -96,10 +127,10 @@ class Blockchain:
             Método que criptografa o bloco e retorna o hash do bloco 
 
             - `param`: block - bloco pelo qual será gerada a hash
-            - `return`: hash do bloco
+            - `return`: hash do bloco (32 bytes)
         """
-        encoded_block = json.dumps(block, sort_keys=True).encode()
-        return hashlib.sha256(encoded_block).hexdigest()
+        encoded_block = HEADER.pack(block['index'], block['timestamp'], block['proof'], block['previous_hash'])
+        return hashlib.sha256(encoded_block).digest()
 
     
     def is_chain_valid(self, chain):
@@ -110,34 +141,36 @@ class Blockchain:
             - `return`: True caso a cadeia esteja integra e False caso não esteja
         """
         
-        # pega o bloco genesis como bloco anterior
-        previous_block = chain[0]
-        block_index = 1
+        # nomes locais evitam buscas de atributo a cada iteração
+        sha256 = hashlib.sha256
+        hash_block = self.hash
 
-        # Itera pela cadeia a partir do segundo bloco (sendo o primeiro o genesis, utilizado como bloco anterior)
-        while block_index < len(chain):
-            # Bloco atual
-            block = chain[block_index]
+        # Itera pela cadeia em pares (bloco anterior, bloco atual) a partir do segundo bloco
+        # (sendo o primeiro o genesis, utilizado como bloco anterior)
+        for previous_block, block in zip(chain, islice(chain, 1, None)):
+            previous_proof = previous_block['proof']
+            current_proof = block['proof']
+
+            # Proofs fora do intervalo não podem ser codificados em bytes (nem teriam sido gerados pela mineração),
+            # então a cadeia não é valida
+            if not (0 <= previous_proof < MAX_PROOF and 0 <= current_proof < MAX_PROOF):
+                return False
 
             # Verifica se o bloco atual está linkado ao bloco anterior (previous hash igual a hash do bloco anterior)
             # Se não tiver, então a cadeia não é valida
-            if block["previous_hash"] != self.hash(previous_block):
+            if block["previous_hash"] != hash_block(previous_block):
                 return False
 
             # Verifica se a hash dp valor de proof atual, quando passado pelo algoritmo (utilizando também o proof anterior)
-            # passa pelo dificuldade atual definida (iniciar com 4 zeros)
-            previous_proof = previous_block['proof']
-            current_proof = block['proof']
-            hash_operation = hashlib.sha256(str(current_proof ** 2 - previous_proof ** 2).encode()).hexdigest()
+            # passa pelo dificuldade atual definida (iniciar com 7 zeros)
+            # ps: (atual - anterior) * (atual + anterior) é igual a atual² - anterior², com uma única multiplicação
+            operation = (current_proof - previous_proof) * (current_proof + previous_proof)
+            hash_operation = sha256(operation.to_bytes(PROOF_BYTES, 'little', signed=True)).digest()
             
             # Verifica a operação hash, caso não estiver de acordo com a dificuldade, a cadeia não é valida
-            if hash_operation[:7] != '0000000':
+            if hash_operation[:4] >= DIFFICULTY_PREFIX:
                 return False
 
-            # Modifica o bloco anterior e o atual e segue verificando a cadeia
-            previous_block = block
-            block_index += 1
-
         # Caso em que nenhum bloco está invalido, retorna True
         return True
 
@@ -148,32 +181,108 @@ class Blockchain:
 
 app = Flask(__name__)
 
+
+def json_response(obj):
+    """
+        Função que serializa a resposta de uma rota em JSON, usando o orjson quando disponível
+
+        - `param`: obj - objeto a ser serializado
+        - `return`: resposta do flask
+    """
+    if orjson is None:
+        return jsonify(obj)
+
+    return Response(orjson.dumps(obj), mimetype='application/json')
+
+
 blockchain = Blockchain()
 
 
+# a busca pelo proof é feita em outro processo, para que as rotas não fiquem bloqueadas durante a mineração;
+# o processo é criado com spawn, pois criar processos com fork a partir de um servidor com várias
+# threads pode travar (e spawn, ao contrário do forkserver, existe em todas as plataformas)
+proof_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+
+# a thread de mineração espera o resultado da busca e insere o bloco na cadeia; com uma única thread,
+# apenas um trabalho roda por vez, pois todos partem do mesmo último bloco da cadeia
+mine_executor = ThreadPoolExecutor(max_workers=1)
+
+# trabalhos de mineração (id -> future com o bloco minerado); apenas os MAX_MINE_JOBS mais recentes
+# são mantidos para consulta, para que o dicionário não cresça indefinidamente
+MAX_MINE_JOBS = 100
+mine_jobs = {}
+mine_lock = threading.Lock()
+current_job = None
+
+
+def mine_next_block():
+    """
+        Função executada na thread de mineração: busca o proof do próximo bloco e o insere na cadeia
+
+        - `return`: o bloco minerado
+    """
+    # get the data we need to create a block
+    previous_block = blockchain.get_previous_block()
+    proof = proof_pool.submit(Blockchain.proof_of_work, previous_block['proof']).result()
+    previous_hash = blockchain.hash(previous_block)
+
+    return blockchain.create_blockchain(proof, previous_hash)
+
+
 @app.route('/mine_block', methods=['GET'])
 def mine_block():
-   # get the data we need to create a block
-   previous_block = blockchain.get_previous_block()
-   previous_proof = previous_block['proof']
-   proof = blockchain.proof_of_work(previous_proof)
-   previous_hash = blockchain.hash(previous_block)
+   global current_job
+
+   with mine_lock:
+      # caso já exista uma mineração em andamento, retorna o id dela
+      if current_job is None or mine_jobs[current_job].done():
+         current_job = (current_job or 0) + 1
+         mine_jobs[current_job] = mine_executor.submit(mine_next_block)
+
+         # descarta os trabalhos mais antigos (o dicionário mantém a ordem de inserção); todos já
+         # terminaram, pois apenas o trabalho atual pode estar em andamento
+         while len(mine_jobs) > MAX_MINE_JOBS:
+            del mine_jobs[next(iter(mine_jobs))]
+
+      job_id = current_job
+
+   response = {'message': 'Mining started!',
+               'job_id': job_id}
+   return json_response(response), 202
+
+
+@app.route('/mine_block/<int:job_id>', methods=['GET'])
+def mine_block_status(job_id):
+   future = mine_jobs.get(job_id)
+   if future is None:
+      return json_response({'message': 'Job not found!'}), 404
+
+   if not future.done():
+      return json_response({'message': 'Mining...', 'job_id': job_id}), 202
+
+   if future.exception() is not None:
+      return json_response({'message': 'Mining failed!', 'job_id': job_id}), 500
 
-   block = blockchain.create_blockchain(proof, previous_hash)
+   block = future.result()
    response = {'message': 'Block mined!',
                'index': block['index'],
-               'timestamp': block['timestamp'],
+               'timestamp': datetime.datetime.fromtimestamp(block['timestamp']).isoformat(' '),
                'proof': block['proof'],
-               'previous_hash': block['previous_hash']}
-   return jsonify(response), 200
+               'previous_hash': block['previous_hash'].hex()}
+   return json_response(response), 200
 
 
 @app.route('/get_chain', methods=['GET'])
 def get_chain():
-   response = {'chain': blockchain.chain,
+   # as hashes são armazenadas em bytes, e convertidas para hexadecimal apenas na resposta
+   chain = [dict(block, previous_hash=block['previous_hash'].hex()) for block in blockchain.chain]
+   response = {'chain': chain,
                'length': len(blockchain.chain)}
-   return jsonify(response), 200
+   return json_response(response), 200
 
 
 
-app.run(host='0.0.0.0', port=5000)
+# servidor de desenvolvimento; em produção a aplicação deve ser servida por um servidor WSGI
+# com um único processo, ex: `gunicorn -w 1 --threads 8 blockchain:app`
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)